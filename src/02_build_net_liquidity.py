@@ -1,69 +1,80 @@
 from __future__ import annotations
 
+import os
 from pathlib import Path
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+
+from io_utils import read_series_many, write_table
 
 
 ROOT = Path(__file__).resolve().parents[1]
 BRONZE = ROOT / "data" / "bronze" / "fred"
 SILVER = ROOT / "data" / "silver"
 
+# CSV solo bajo demanda (EMIT_CSV=1); Parquet es la salida canónica
+EMIT_CSV = bool(os.getenv("EMIT_CSV"))
 
-def _read_series(path: Path, series_id: str) -> pd.DataFrame:
-    if not path.exists():
-        raise SystemExit(f"[ERROR] No existe: {path}")
-
-    df = pd.read_parquet(path)
+# Columnas que se escriben en float64; el resto de floats va a float32
+KEEP64 = {"WALCL", "RRPONTSYD", "WTREGEN", "net_liquidity_usa"}
 
-    # Esperamos columnas: date, value, series_id
-    if "date" not in df.columns or "value" not in df.columns:
-        raise SystemExit(f"[ERROR] Formato inesperado en {path}. Columnas: {list(df.columns)}")
 
-    df = df[["date", "value"]].copy()
-    df["date"] = pd.to_datetime(df["date"], utc=True, errors="coerce")
-    df["value"] = pd.to_numeric(df["value"], errors="coerce")
-    df = df.dropna(subset=["date", "value"]).sort_values("date")
-
-    df = df.rename(columns={"value": series_id})
-    return df
+def _diff(x: np.ndarray, k: int) -> np.ndarray:
+    out = np.full(len(x), np.nan)
+    out[k:] = x[k:] - x[:-k]
+    return out
 
 
 def main() -> None:
     SILVER.mkdir(parents=True, exist_ok=True)
 
     # Inputs
-    walcl = _read_series(BRONZE / "WALCL.parquet", "WALCL")         # Fed total assets
-    rrp = _read_series(BRONZE / "RRPONTSYD.parquet", "RRPONTSYD")   # Reverse Repo ON
-    tga = _read_series(BRONZE / "WTREGEN.parquet", "WTREGEN")       # TGA weekly avg
+    walcl, rrp, tga = read_series_many([
+        (BRONZE / "WALCL.parquet", "WALCL"),          # Fed total assets
+        (BRONZE / "RRPONTSYD.parquet", "RRPONTSYD"),  # Reverse Repo ON
+        (BRONZE / "WTREGEN.parquet", "WTREGEN"),      # TGA weekly avg
+    ])
 
-    # Unimos por fecha (outer) y hacemos forward-fill para alinear frecuencias
-    df = walcl.merge(rrp, on="date", how="outer").merge(tga, on="date", how="outer")
-    df = df.sort_values("date")
+    # Un único concat por columnas sobre el índice de fechas (outer join, sin merges encadenados)
+    series = [walcl, rrp, tga]
+    df = pd.concat(series, axis=1).sort_index()
 
     # Forward fill (porque WALCL/WTREGEN son semanales y RRP es diario)
-    df[["WALCL", "RRPONTSYD", "WTREGEN"]] = df[["WALCL", "RRPONTSYD", "WTREGEN"]].ffill()
+    df = df.ffill()
 
     # Quita filas iniciales donde aún no hay datos suficientes
     df = df.dropna(subset=["WALCL", "RRPONTSYD", "WTREGEN"])
 
+    # A partir de aquí: arrays por columna (SoA) y salida directa a Arrow,
+    # sin reset_index ni copias intermedias del DataFrame
+    cols = {c: df[c].to_numpy() for c in ("WALCL", "RRPONTSYD", "WTREGEN")}
+
     # Calcula Net Liquidity (USA)
-    df["net_liquidity_usa"] = df["WALCL"] - df["RRPONTSYD"] - df["WTREGEN"]
+    net = cols["WALCL"] - cols["RRPONTSYD"] - cols["WTREGEN"]
 
-    # Deltas (útiles para régimen)
-    df["net_liquidity_usa_d1"] = df["net_liquidity_usa"].diff(1)
-    df["net_liquidity_usa_w1"] = df["net_liquidity_usa"].diff(7)
+    table = pa.table({
+        "date": df.index.to_numpy(),
+        **cols,
+        "net_liquidity_usa": net,
+        # Deltas (útiles para régimen)
+        "net_liquidity_usa_d1": _diff(net, 1),
+        "net_liquidity_usa_w1": _diff(net, 7),
+    })
 
     out_parquet = SILVER / "net_liquidity_usa.parquet"
     out_csv = SILVER / "net_liquidity_usa.csv"
 
-    df.to_parquet(out_parquet, index=False)
-    df.to_csv(out_csv, index=False)
+    write_table(table, out_parquet, keep64=KEEP64)
+    if EMIT_CSV:
+        table.to_pandas().to_csv(out_csv, index=False)
 
     print("[OK] Net Liquidity (USA) construido.")
     print(f"     Parquet: {out_parquet}")
-    print(f"     CSV:     {out_csv}")
+    if EMIT_CSV:
+        print(f"     CSV:     {out_csv}")
     print("\nÚltimas filas:")
-    print(df.tail(10).to_string(index=False))
+    print(table.slice(max(table.num_rows - 10, 0)).to_pandas().to_string(index=False))
 
 
 if __name__ == "__main__":
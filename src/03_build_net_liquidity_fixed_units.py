@@ -1,10 +1,18 @@
 from __future__ import annotations
 
+import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import requests
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 from dotenv import load_dotenv
+
+from io_utils import read_series_many, write_table
+from ingest.session import make_session
+
 load_dotenv(Path(__file__).resolve().parents[1] / ".env")
 
 
@@ -13,25 +21,20 @@ ROOT = Path(__file__).resolve().parents[1]
 BRONZE = ROOT / "data" / "bronze" / "fred"
 SILVER = ROOT / "data" / "silver"
 
+# CSV solo bajo demanda (EMIT_CSV=1); Parquet es la salida canónica
+EMIT_CSV = bool(os.getenv("EMIT_CSV"))
 
-FRED_SERIES_ENDPOINT = "https://api.stlouisfed.org/fred/series"
-
-
-def _read_series(path: Path, series_id: str) -> pd.DataFrame:
-    if not path.exists():
-        raise SystemExit(f"[ERROR] No existe: {path}")
+# Columnas que se escriben en float64; el resto de floats va a float32
+KEEP64 = {"WALCL", "RRPONTSYD", "WTREGEN", "net_liquidity_usa_millions"}
 
-    df = pd.read_parquet(path)
 
-    if "date" not in df.columns or "value" not in df.columns:
-        raise SystemExit(f"[ERROR] Formato inesperado en {path}. Columnas: {list(df.columns)}")
+FRED_SERIES_ENDPOINT = "https://api.stlouisfed.org/fred/series"
+# Misma Session que la ingesta: keep-alive + reintentos con backoff (429/5xx)
+_SESSION = make_session()
 
-    df = df[["date", "value"]].copy()
-    df["date"] = pd.to_datetime(df["date"], utc=True, errors="coerce")
-    df["value"] = pd.to_numeric(df["value"], errors="coerce")
-    df = df.dropna(subset=["date", "value"]).sort_values("date")
-    df = df.rename(columns={"value": series_id})
-    return df
+# Las unidades de FRED casi nunca cambian: caché en disco con TTL
+UNITS_CACHE_PATH = BRONZE / "_units_cache.json"
+UNITS_CACHE_TTL_S = 30 * 86400
 
 
 def _fred_series_units(series_id: str) -> str | None:
@@ -44,7 +47,7 @@ def _fred_series_units(series_id: str) -> str | None:
         raise SystemExit("[ERROR] Falta FRED_API_KEY en tu .env para consultar metadata de unidades.")
 
     params = {"series_id": series_id, "api_key": api_key, "file_type": "json"}
-    r = requests.get(FRED_SERIES_ENDPOINT, params=params, timeout=30)
+    r = _SESSION.get(FRED_SERIES_ENDPOINT, params=params, timeout=30)
     r.raise_for_status()
     js = r.json()
     series = js.get("seriess", [])
@@ -53,6 +56,38 @@ def _fred_series_units(series_id: str) -> str | None:
     return series[0].get("units")
 
 
+def _fred_units_cached(series_ids: list[str]) -> dict[str, str | None]:
+    """
+    Unidades FRED por series_id usando la caché en disco
+    ({series_id: {"units": str, "ts": epoch}}). Solo consulta la API
+    para las series ausentes o caducadas, en paralelo.
+    """
+    cache: dict[str, dict] = {}
+    if UNITS_CACHE_PATH.exists():
+        try:
+            cache = json.loads(UNITS_CACHE_PATH.read_text(encoding="utf-8"))
+        except ValueError:
+            print(f"[WARN] Caché de unidades ilegible ({UNITS_CACHE_PATH}). Se regenera.")
+
+    now = time.time()
+    stale = [
+        sid for sid in series_ids
+        if sid not in cache or now - float(cache[sid].get("ts", 0)) >= UNITS_CACHE_TTL_S
+    ]
+    if stale:
+        with ThreadPoolExecutor(max_workers=min(3, len(stale))) as ex:
+            fetched = dict(zip(stale, ex.map(_fred_series_units, stale)))
+
+        for sid, units in fetched.items():
+            if units is not None:
+                cache[sid] = {"units": units, "ts": now}
+
+        UNITS_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        UNITS_CACHE_PATH.write_text(json.dumps(cache, indent=2), encoding="utf-8")
+
+    return {sid: cache.get(sid, {}).get("units") for sid in series_ids}
+
+
 def _to_millions_multiplier(units: str | None) -> float:
     """
     Convierte a MILLIONS como unidad común:
@@ -77,18 +112,27 @@ def _to_millions_multiplier(units: str | None) -> float:
     return 1.0
 
 
+def _diff(x: np.ndarray, k: int) -> np.ndarray:
+    out = np.full(len(x), np.nan)
+    out[k:] = x[k:] - x[:-k]
+    return out
+
+
 def main() -> None:
     SILVER.mkdir(parents=True, exist_ok=True)
 
     # 1) Leer series
-    walcl = _read_series(BRONZE / "WALCL.parquet", "WALCL")         # Fed total assets
-    rrp = _read_series(BRONZE / "RRPONTSYD.parquet", "RRPONTSYD")   # Reverse Repo ON
-    tga = _read_series(BRONZE / "WTREGEN.parquet", "WTREGEN")       # TGA weekly avg
-
-    # 2) Detectar unidades en FRED y convertir todo a MILLIONS
-    units_walcl = _fred_series_units("WALCL")
-    units_rrp = _fred_series_units("RRPONTSYD")
-    units_tga = _fred_series_units("WTREGEN")
+    walcl, rrp, tga = read_series_many([
+        (BRONZE / "WALCL.parquet", "WALCL"),          # Fed total assets
+        (BRONZE / "RRPONTSYD.parquet", "RRPONTSYD"),  # Reverse Repo ON
+        (BRONZE / "WTREGEN.parquet", "WTREGEN"),      # TGA weekly avg
+    ])
+
+    # 2) Detectar unidades en FRED (con caché) y convertir todo a MILLIONS
+    units = _fred_units_cached(["WALCL", "RRPONTSYD", "WTREGEN"])
+    units_walcl = units["WALCL"]
+    units_rrp = units["RRPONTSYD"]
+    units_tga = units["WTREGEN"]
 
     mult_walcl = _to_millions_multiplier(units_walcl)
     mult_rrp = _to_millions_multiplier(units_rrp)
@@ -99,35 +143,40 @@ def main() -> None:
     print(f"  RRPONTSYD units='{units_rrp}'    mult_to_millions={mult_rrp}")
     print(f"  WTREGEN   units='{units_tga}'    mult_to_millions={mult_tga}")
 
-    walcl["WALCL"] = walcl["WALCL"] * mult_walcl
-    rrp["RRPONTSYD"] = rrp["RRPONTSYD"] * mult_rrp
-    tga["WTREGEN"] = tga["WTREGEN"] * mult_tga
+    walcl = walcl * mult_walcl
+    rrp = rrp * mult_rrp
+    tga = tga * mult_tga
 
-    # 3) Merge + ffill (alineación)
-    df = walcl.merge(rrp, on="date", how="outer").merge(tga, on="date", how="outer").sort_values("date")
-    df[["WALCL", "RRPONTSYD", "WTREGEN"]] = df[["WALCL", "RRPONTSYD", "WTREGEN"]].ffill()
+    # 3) Alineación: un único concat por columnas sobre el índice de fechas + ffill
+    series = [walcl, rrp, tga]
+    df = pd.concat(series, axis=1).sort_index().ffill()
     df = df.dropna(subset=["WALCL", "RRPONTSYD", "WTREGEN"])
 
-    # 4) Net Liquidity (en MILLIONS)
-    df["net_liquidity_usa_millions"] = df["WALCL"] - df["RRPONTSYD"] - df["WTREGEN"]
-    df["net_liquidity_usa_millions_d1"] = df["net_liquidity_usa_millions"].diff(1)
-    df["net_liquidity_usa_millions_w1"] = df["net_liquidity_usa_millions"].diff(7)
+    # 4) Net Liquidity (en MILLIONS) sobre arrays por columna, salida directa a Arrow
+    cols = {c: df[c].to_numpy() for c in ("WALCL", "RRPONTSYD", "WTREGEN")}
+    net = cols["WALCL"] - cols["RRPONTSYD"] - cols["WTREGEN"]
+
+    table = pa.table({
+        "date": df.index.to_numpy(),
+        **cols,
+        "net_liquidity_usa_millions": net,
+        "net_liquidity_usa_millions_d1": _diff(net, 1),
+        "net_liquidity_usa_millions_w1": _diff(net, 7),
+    })
 
     out_parquet = SILVER / "net_liquidity_usa_fixed.parquet"
     out_csv = SILVER / "net_liquidity_usa_fixed.csv"
 
-    df.to_parquet(out_parquet, index=False)
-    df.to_csv(out_csv, index=False)
+    write_table(table, out_parquet, keep64=KEEP64)
+    if EMIT_CSV:
+        table.to_pandas().to_csv(out_csv, index=False)
 
     print("\n[OK] Net Liquidity (USA) FIXED (unidades consistentes) construido.")
     print(f"     Parquet: {out_parquet}")
-    print(f"     CSV:     {out_csv}")
+    if EMIT_CSV:
+        print(f"     CSV:     {out_csv}")
     print("\nÚltimas filas:")
-    cols = [
-        "date", "WALCL", "RRPONTSYD", "WTREGEN",
-        "net_liquidity_usa_millions", "net_liquidity_usa_millions_d1", "net_liquidity_usa_millions_w1"
-    ]
-    print(df[cols].tail(10).to_string(index=False))
+    print(table.slice(max(table.num_rows - 10, 0)).to_pandas().to_string(index=False))
 
 
 if __name__ == "__main__":
@@ -1,55 +1,55 @@
 from __future__ import annotations
 
+import os
 from pathlib import Path
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+
+from io_utils import read_series_many, write_table
 
 
 ROOT = Path(__file__).resolve().parents[1]
 BRONZE = ROOT / "data" / "bronze" / "fred"
 SILVER = ROOT / "data" / "silver"
 
+# CSV solo bajo demanda (EMIT_CSV=1); Parquet es la salida canónica
+EMIT_CSV = bool(os.getenv("EMIT_CSV"))
 
-def _read(path: Path, colname: str) -> pd.DataFrame:
-    if not path.exists():
-        raise SystemExit(f"[ERROR] No existe: {path}")
-    df = pd.read_parquet(path)
-    if "date" not in df.columns or "value" not in df.columns:
-        raise SystemExit(f"[ERROR] Formato inesperado en {path}. Columnas: {list(df.columns)}")
-    df = df[["date", "value"]].copy()
-    df["date"] = pd.to_datetime(df["date"], utc=True, errors="coerce")
-    df["value"] = pd.to_numeric(df["value"], errors="coerce")
-    df = df.dropna(subset=["date", "value"]).sort_values("date")
-    return df.rename(columns={"value": colname})
+# Columnas que se escriben en float64; el resto de floats va a float32
+KEEP64 = {
+    "fed_usd_millions",
+    "ecb_usd_millions",
+    "boj_usd_millions",
+    "global_cb_assets_usd_millions",
+}
 
 
-def main() -> None:
-    SILVER.mkdir(parents=True, exist_ok=True)
+def _diff(x: np.ndarray, k: int) -> np.ndarray:
+    out = np.full(len(x), np.nan)
+    out[k:] = x[k:] - x[:-k]
+    return out
 
-    # -------------------------
-    # Assets (native units)
-    # -------------------------
-    fed = _read(BRONZE / "WALCL.parquet", "fed_usd_millions")  # already USD millions
 
-    ecb = _read(BRONZE / "ECBASSETSW.parquet", "ecb_eur_millions")  # typically EUR millions (from ECB via FRED)
-    boj = _read(BRONZE / "JPNASSETS.parquet", "boj_100m_yen")       # 100 million yen units :contentReference[oaicite:4]{index=4}
+def main() -> None:
+    SILVER.mkdir(parents=True, exist_ok=True)
 
     # -------------------------
-    # FX
+    # Assets (native units) + FX, leídos en paralelo
     # -------------------------
-    # DEXJPUS: JPY per 1 USD :contentReference[oaicite:5]{index=5}
-    jpy_per_usd = _read(BRONZE / "DEXJPUS.parquet", "jpy_per_usd")
-
-    # DEXUSEU: USD per 1 EUR (FRED series)
-    usd_per_eur = _read(BRONZE / "DEXUSEU.parquet", "usd_per_eur")
+    fed, ecb, boj, jpy_per_usd, usd_per_eur = read_series_many([
+        (BRONZE / "WALCL.parquet", "fed_usd_millions"),       # already USD millions
+        (BRONZE / "ECBASSETSW.parquet", "ecb_eur_millions"),  # typically EUR millions (from ECB via FRED)
+        (BRONZE / "JPNASSETS.parquet", "boj_100m_yen"),       # 100 million yen units
+        (BRONZE / "DEXJPUS.parquet", "jpy_per_usd"),          # DEXJPUS: JPY per 1 USD
+        (BRONZE / "DEXUSEU.parquet", "usd_per_eur"),          # DEXUSEU: USD per 1 EUR (FRED series)
+    ])
 
     # -------------------------
-    # Merge all (outer) and align
+    # Align: un único concat por columnas sobre el índice de fechas (outer join)
     # -------------------------
-    df = fed.merge(ecb, on="date", how="outer")
-    df = df.merge(boj, on="date", how="outer")
-    df = df.merge(jpy_per_usd, on="date", how="outer")
-    df = df.merge(usd_per_eur, on="date", how="outer")
-    df = df.sort_values("date")
+    series = [fed, ecb, boj, jpy_per_usd, usd_per_eur]
+    df = pd.concat(series, axis=1).sort_index()
 
     # forward-fill (porque assets son weekly/monthly y FX daily)
     cols_ffill = ["fed_usd_millions", "ecb_eur_millions", "boj_100m_yen", "jpy_per_usd", "usd_per_eur"]
@@ -58,51 +58,56 @@ def main() -> None:
     # drop leading NaNs
     df = df.dropna(subset=["fed_usd_millions", "ecb_eur_millions", "boj_100m_yen", "jpy_per_usd", "usd_per_eur"])
 
+    # Columnas como arrays (SoA): aritmética en NumPy y salida directa a Arrow
+    fed_usd = df["fed_usd_millions"].to_numpy()
+    ecb_eur = df["ecb_eur_millions"].to_numpy()
+    boj_100m_yen = df["boj_100m_yen"].to_numpy()
+    jpy_usd = df["jpy_per_usd"].to_numpy()
+    usd_eur = df["usd_per_eur"].to_numpy()
+
     # -------------------------
     # Convert to USD (millions)
     # -------------------------
     # ECB: EUR millions -> USD millions
-    df["ecb_usd_millions"] = df["ecb_eur_millions"] * df["usd_per_eur"]
+    ecb_usd = ecb_eur * usd_eur
 
     # BOJ: units = 100 million yen
     # 100 million yen = 100,000,000 JPY
     # Convert to USD: JPY / (JPY per USD) = USD
     # Then convert to "millions USD": divide by 1,000,000
     # => (boj_100m_yen * 100,000,000) / jpy_per_usd / 1,000,000 = boj_100m_yen * 100 / jpy_per_usd
-    df["boj_usd_millions"] = df["boj_100m_yen"] * 100.0 / df["jpy_per_usd"]
+    boj_usd = boj_100m_yen * 100.0 / jpy_usd
 
     # FED already USD millions
-    df["global_cb_assets_usd_millions"] = df["fed_usd_millions"] + df["ecb_usd_millions"] + df["boj_usd_millions"]
-
-    # Deltas útiles
-    df["global_cb_assets_usd_d1"] = df["global_cb_assets_usd_millions"].diff(1)
-    df["global_cb_assets_usd_w1"] = df["global_cb_assets_usd_millions"].diff(7)
+    total = fed_usd + ecb_usd + boj_usd
 
     # Output
     out_parquet = SILVER / "global_cb_assets_usd.parquet"
     out_csv = SILVER / "global_cb_assets_usd.csv"
 
-    keep = [
-        "date",
-        "fed_usd_millions",
-        "ecb_usd_millions",
-        "boj_usd_millions",
-        "global_cb_assets_usd_millions",
-        "global_cb_assets_usd_d1",
-        "global_cb_assets_usd_w1",
-        "usd_per_eur",
-        "jpy_per_usd",
-    ]
-    df_out = df[keep].copy()
-
-    df_out.to_parquet(out_parquet, index=False)
-    df_out.to_csv(out_csv, index=False)
+    table = pa.table({
+        "date": df.index.to_numpy(),
+        "fed_usd_millions": fed_usd,
+        "ecb_usd_millions": ecb_usd,
+        "boj_usd_millions": boj_usd,
+        "global_cb_assets_usd_millions": total,
+        # Deltas útiles
+        "global_cb_assets_usd_d1": _diff(total, 1),
+        "global_cb_assets_usd_w1": _diff(total, 7),
+        "usd_per_eur": usd_eur,
+        "jpy_per_usd": jpy_usd,
+    })
+
+    write_table(table, out_parquet, keep64=KEEP64)
+    if EMIT_CSV:
+        table.to_pandas().to_csv(out_csv, index=False)
 
     print("[OK] Global CB Assets (USD) construido.")
     print(f"     Parquet: {out_parquet}")
-    print(f"     CSV:     {out_csv}")
+    if EMIT_CSV:
+        print(f"     CSV:     {out_csv}")
     print("\nÚltimas filas:")
-    print(df_out.tail(10).to_string(index=False))
+    print(table.slice(max(table.num_rows - 10, 0)).to_pandas().to_string(index=False))
 
 
 if __name__ == "__main__":
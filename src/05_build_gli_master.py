@@ -1,26 +1,220 @@
 from __future__ import annotations
 
+import os
+import sys
 from pathlib import Path
 import pandas as pd
 import numpy as np
+from numba import njit
+
+from io_utils import write_feather, write_parquet
 
 ROOT = Path(__file__).resolve().parents[1]
 SILVER = ROOT / "data" / "silver"
 FEATURES = ROOT / "data" / "features"
 
+# CSV solo bajo demanda (EMIT_CSV=1); Parquet es la salida canónica
+EMIT_CSV = bool(os.getenv("EMIT_CSV"))
+
+# Columnas que se escriben en float64; el resto de floats va a float32
+KEEP64 = {"net_liquidity_usa_millions", "global_cb_assets_usd_millions"}
+
+WINDOWS = (90, 252)
+LAGS = (1, 7)
+# Rebuild incremental: días recientes que siempre se recalculan (series
+# semanales/mensuales que llegan con retraso reescriben el ffill de la cola)
+# y filas de historia previas que necesitan las ventanas rolling / pct_change(7)
+REFRESH_DAYS = 62
+CONTEXT_ROWS = max(WINDOWS) + max(LAGS)
+# Varianza relativa por debajo de la cual la ventana se trata como constante
+VAR_EPS = 1e-10
+
+
+@njit(cache=True)
+def _insert_sorted(buf: np.ndarray, size: int, v: float) -> None:
+    k = np.searchsorted(buf[:size], v)
+    for j in range(size, k, -1):
+        buf[j] = buf[j - 1]
+    buf[k] = v
+
+
+@njit(cache=True)
+def _remove_sorted(buf: np.ndarray, size: int, v: float) -> None:
+    k = np.searchsorted(buf[:size], v)
+    for j in range(k, size - 1):
+        buf[j] = buf[j + 1]
+
+
+@njit(cache=True, error_model="numpy")
+def _sweep(
+    x: np.ndarray,
+    windows: np.ndarray,
+    lags: np.ndarray,
+    z_out: np.ndarray,
+    pct_out: np.ndarray,
+    chg_out: np.ndarray,
+) -> None:
+    """
+    Una sola pasada sobre `x` que rellena, para cada ventana windows[k]:
+      z_out[k]   z-score rolling (ddof=0) con sumas móviles
+      pct_out[k] percentil rolling (rank(pct=True), empates con rango medio)
+                 con la ventana ordenada + búsqueda binaria; solo si pct_out
+                 tiene filas
+    y para cada lags[j] el pct_change en chg_out[j].
+    Ventanas con algún NaN quedan a NaN, como en rolling(). Ventanas de
+    varianza cero (todos los valores iguales, o varianza ~0 por redondeo)
+    dan z-score NaN, como (s - mu) / sd = 0/0.
+    """
+    n = x.shape[0]
+    nw = windows.shape[0]
+    do_pct = pct_out.shape[0] > 0
+
+    # centramos en el primer valor válido para limitar la cancelación en sum(x^2)
+    center = 0.0
+    for i in range(n):
+        if not np.isnan(x[i]):
+            center = x[i]
+            break
+
+    s1 = np.zeros(nw)
+    s2 = np.zeros(nw)
+    n_nan = np.zeros(nw, dtype=np.int64)
+    buf = np.empty((nw, windows.max()))
+    size = np.zeros(nw, dtype=np.int64)
+    # nº de valores iguales consecutivos que terminan en i (ventana constante si >= w)
+    same_run = 0
+
+    for i in range(n):
+        xi = x[i]
+        xi_nan = np.isnan(xi)
+        xc = xi - center
+        if xi_nan:
+            same_run = 0
+        elif i > 0 and xi == x[i - 1]:
+            same_run += 1
+        else:
+            same_run = 1
+
+        for j in range(lags.shape[0]):
+            if i >= lags[j]:
+                chg_out[j, i] = xi / x[i - lags[j]] - 1.0
+
+        for k in range(nw):
+            w = windows[k]
+
+            # sale x[i-w]
+            if i >= w:
+                old = x[i - w]
+                if np.isnan(old):
+                    n_nan[k] -= 1
+                else:
+                    oc = old - center
+                    s1[k] -= oc
+                    s2[k] -= oc * oc
+                    if do_pct:
+                        _remove_sorted(buf[k], size[k], old)
+                        size[k] -= 1
+
+            # entra x[i]
+            if xi_nan:
+                n_nan[k] += 1
+            else:
+                s1[k] += xc
+                s2[k] += xc * xc
+                if do_pct:
+                    _insert_sorted(buf[k], size[k], xi)
+                    size[k] += 1
+
+            if i >= w - 1 and n_nan[k] == 0:
+                mean = s1[k] / w
+                var = s2[k] / w - mean * mean
+                # ventana constante o varianza ~0 (deriva de redondeo de las sumas
+                # móviles): NaN como 0/0, no ±inf
+                if same_run < w and var > VAR_EPS * max(mean * mean, 1.0):
+                    z_out[k, i] = (xc - mean) / np.sqrt(var)
+                if do_pct:
+                    left = np.searchsorted(buf[k, :size[k]], xi, side="left")
+                    right = np.searchsorted(buf[k, :size[k]], xi, side="right")
+                    pct_out[k, i] = (left + (right - left + 1) / 2.0) / w
+
+
+def _series_features(
+    s: pd.Series, lags: tuple[int, ...] = (), with_pct: bool = False
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    n = len(s)
+    z = np.full((len(WINDOWS), n), np.nan)
+    pct = np.full((len(WINDOWS) if with_pct else 0, n), np.nan)
+    chg = np.full((len(lags), n), np.nan)
+    _sweep(
+        s.to_numpy(dtype=float),
+        np.asarray(WINDOWS, dtype=np.int64),
+        np.asarray(lags, dtype=np.int64),
+        z,
+        pct,
+        chg,
+    )
+    return z, pct, chg
 
-def zscore(s: pd.Series, window: int) -> pd.Series:
-    mu = s.rolling(window).mean()
-    sd = s.rolling(window).std(ddof=0)
-    return (s - mu) / sd
 
+def _add_features(df: pd.DataFrame) -> pd.DataFrame:
+    # Una pasada por serie base: pct_change, z-scores y percentiles a la vez
+    nl_z, nl_pct, nl_chg = _series_features(df["net_liquidity_usa_millions"], LAGS, with_pct=True)
+    gcb_z, gcb_pct, gcb_chg = _series_features(df["global_cb_assets_usd_millions"], LAGS, with_pct=True)
+    nl_d1_z, _, _ = _series_features(df["net_liquidity_usa_millions_d1"])
+    gcb_d1_z, _, _ = _series_features(df["global_cb_assets_usd_d1"])
 
-def pct_rank(s: pd.Series, window: int) -> pd.Series:
-    # percentil rolling: valor actual dentro de la ventana
-    return s.rolling(window).apply(lambda x: pd.Series(x).rank(pct=True).iloc[-1], raw=False)
+    feats: dict[str, np.ndarray] = {
+        # Features adicionales
+        "netliq_d1_pct": nl_chg[0],
+        "netliq_w1_pct": nl_chg[1],
+        "gcb_d1_pct": gcb_chg[0],
+        "gcb_w1_pct": gcb_chg[1],
+    }
+    # Z-scores (ventanas típicas)
+    for k, w in enumerate(WINDOWS):
+        feats[f"netliq_z{w}"] = nl_z[k]
+        feats[f"gcb_z{w}"] = gcb_z[k]
+        feats[f"netliq_d1_z{w}"] = nl_d1_z[k]
+        feats[f"gcb_d1_z{w}"] = gcb_d1_z[k]
+    # Percentiles rolling (más robusto para regímenes)
+    for k, w in enumerate(WINDOWS):
+        feats[f"netliq_pct{w}"] = nl_pct[k]
+        feats[f"gcb_pct{w}"] = gcb_pct[k]
+
+    return pd.concat([df, pd.DataFrame(feats, index=df.index)], axis=1)
+
+
+def _build_incremental(df: pd.DataFrame, prev: pd.DataFrame) -> pd.DataFrame | None:
+    """
+    Recalcula features solo en la cola: filas desde (última fecha previa -
+    REFRESH_DAYS) con CONTEXT_ROWS filas de historia para las ventanas.
+    Devuelve None si la caché previa no es reutilizable (=> rebuild completo),
+    también si su historia ya no coincide con silver.
+    """
+    if prev.empty:
+        return None
 
+    prev = prev.assign(date=pd.to_datetime(prev["date"], utc=True, errors="coerce").dt.tz_localize(None))
+    refresh_from = prev["date"].max() - pd.Timedelta(days=REFRESH_DAYS)
 
-def main() -> None:
+    start = int(df["date"].searchsorted(refresh_from, side="left"))
+    # silver acaba antes de la ventana de refresco (re-fetch con `end`, fuente parada): sin cola
+    if start < CONTEXT_ROWS or start >= len(df):
+        return None
+    tail = _add_features(df.iloc[start - CONTEXT_ROWS:]).iloc[CONTEXT_ROWS:]
+    if tail.empty or list(tail.columns) != list(prev.columns):
+        return None
+
+    head = prev.loc[prev["date"] < tail["date"].iloc[0]]
+    # la historia reutilizada debe seguir igual en silver (revisiones FRED, unidades,
+    # --compact): niveles en float64 (KEEP64) => comparación exacta
+    cols = ["date", "net_liquidity_usa_millions", "global_cb_assets_usd_millions"]
+    if not head[cols].reset_index(drop=True).equals(df[cols].iloc[:start].reset_index(drop=True)):
+        return None
+    return pd.concat([head, tail], ignore_index=True)
+
+
+def main(full: bool = False) -> None:
     FEATURES.mkdir(parents=True, exist_ok=True)
 
     p_net = SILVER / "net_liquidity_usa_fixed.parquet"
@@ -34,9 +228,9 @@ def main() -> None:
     net = pd.read_parquet(p_net)
     gcb = pd.read_parquet(p_gcb)
 
-    # Normaliza fechas
-    net["date"] = pd.to_datetime(net["date"], utc=True, errors="coerce")
-    gcb["date"] = pd.to_datetime(gcb["date"], utc=True, errors="coerce")
+    # Normaliza fechas (naive UTC: merge/sort más baratos que con tz)
+    net["date"] = pd.to_datetime(net["date"], utc=True, errors="coerce").dt.tz_localize(None)
+    gcb["date"] = pd.to_datetime(gcb["date"], utc=True, errors="coerce").dt.tz_localize(None)
 
     # Selección de columnas clave
     net = net[[
@@ -58,41 +252,35 @@ def main() -> None:
     # Merge
     df = net.merge(gcb, on="date", how="inner").sort_values("date").reset_index(drop=True)
 
-    # Features adicionales
-    df["netliq_d1_pct"] = df["net_liquidity_usa_millions"].pct_change(1)
-    df["netliq_w1_pct"] = df["net_liquidity_usa_millions"].pct_change(7)
-    df["gcb_d1_pct"] = df["global_cb_assets_usd_millions"].pct_change(1)
-    df["gcb_w1_pct"] = df["global_cb_assets_usd_millions"].pct_change(7)
-
-    # Z-scores (ventanas típicas)
-    for w in (90, 252):
-        df[f"netliq_z{w}"] = zscore(df["net_liquidity_usa_millions"], w)
-        df[f"gcb_z{w}"] = zscore(df["global_cb_assets_usd_millions"], w)
-
-        df[f"netliq_d1_z{w}"] = zscore(df["net_liquidity_usa_millions_d1"], w)
-        df[f"gcb_d1_z{w}"] = zscore(df["global_cb_assets_usd_d1"], w)
-
-    # Percentiles rolling (más robusto para regímenes)
-    for w in (90, 252):
-        df[f"netliq_pct{w}"] = pct_rank(df["net_liquidity_usa_millions"], w)
-        df[f"gcb_pct{w}"] = pct_rank(df["global_cb_assets_usd_millions"], w)
-
     out_parquet = FEATURES / "gli_master.parquet"
+    out_feather = FEATURES / "gli_master.feather"
     out_csv = FEATURES / "gli_master.csv"
-    df.to_parquet(out_parquet, index=False)
-    df.to_csv(out_csv, index=False)
+
+    # Incremental por defecto si ya existe gli_master; --full fuerza rebuild completo
+    built = None
+    if not full and out_parquet.exists():
+        built = _build_incremental(df, pd.read_parquet(out_parquet))
+        if built is None:
+            print("[INFO] gli_master previo no reutilizable -> rebuild completo.")
+        else:
+            print(f"[INFO] Rebuild incremental (últimos {REFRESH_DAYS} días + contexto).")
+    df = built if built is not None else _add_features(df)
+
+    write_parquet(df, out_parquet, keep64=KEEP64)
+    # hand-off a 06/07: Arrow IPC leído por memory_map (después del Parquet: mtime >=)
+    write_feather(df, out_feather, keep64=KEEP64)
+    if EMIT_CSV:
+        df.to_csv(out_csv, index=False)
 
     print("[OK] GLI master construido.")
     print(f"     Parquet: {out_parquet}")
-    print(f"     CSV:     {out_csv}")
+    print(f"     Feather: {out_feather}")
+    if EMIT_CSV:
+        print(f"     CSV:     {out_csv}")
     print("\nColumnas:", ", ".join(df.columns))
     print("\nÚltimas filas:")
     print(df.tail(5).to_string(index=False))
 
 
 if __name__ == "__main__":
-    main()
-
-
-
-## python 05_build_gli_master.py
+    main(full="--full" in sys.argv[1:])
@@ -1,17 +1,25 @@
 from __future__ import annotations
 
+import os
 from pathlib import Path
-import pandas as pd
 import numpy as np
 
 from sklearn.mixture import GaussianMixture
 from sklearn.preprocessing import StandardScaler
 
+from io_utils import read_features, write_parquet
+
 
 ROOT = Path(__file__).resolve().parents[1]
 FEATURES = ROOT / "data" / "features"
 OUT = ROOT / "data" / "models"
 
+# CSV solo bajo demanda (EMIT_CSV=1); Parquet es la salida canónica
+EMIT_CSV = bool(os.getenv("EMIT_CSV"))
+
+# Probabilidades / z-scores: todo en float32 al escribir
+KEEP64: set[str] = set()
+
 
 def main() -> None:
     OUT.mkdir(parents=True, exist_ok=True)
@@ -20,7 +28,7 @@ def main() -> None:
     if not p.exists():
         raise SystemExit(f"[ERROR] Falta: {p}. Ejecuta primero 05_build_gli_master.py")
 
-    df = pd.read_parquet(p).sort_values("date").reset_index(drop=True)
+    df = read_features(p).sort_values("date").reset_index(drop=True)
 
     # Features para régimen: usa percentiles + deltas (robusto a escalas)
     feat_cols = [
@@ -46,8 +54,15 @@ def main() -> None:
     scaler = StandardScaler()
     Xs = scaler.fit_transform(X2)
 
-    # Modelo 3 regímenes
-    gmm = GaussianMixture(n_components=3, covariance_type="full", random_state=42)
+    # Modelo 3 regímenes: covarianzas diagonales (features ya escaladas) y
+    # n_init reinicios internos; sklearn se queda con el mejor ajuste
+    gmm = GaussianMixture(
+        n_components=3,
+        covariance_type="diag",
+        n_init=10,
+        reg_covar=1e-4,
+        random_state=42,
+    )
     regimes = gmm.fit_predict(Xs)
     probs = gmm.predict_proba(Xs)
 
@@ -58,21 +73,27 @@ def main() -> None:
 
     # Ordena regímenes por “expansivo → contractivo”
     # Heurística: mayor netliq_z252 y gcb_z252 = más expansivo
-    stats = df2.groupby("regime_raw")[["netliq_z252", "gcb_z252"]].mean()
-    score = stats["netliq_z252"] + stats["gcb_z252"]
-    order = score.sort_values(ascending=False).index.tolist()  # [más expansivo ... más contractivo]
-    mapping = {old: new for new, old in enumerate(order)}  # 0=expansivo,1=neutral,2=contractivo
+    # (medias por estado con bincount; un estado vacío queda con score NaN -> al final)
+    counts = np.bincount(regimes, minlength=3)
+    s_net = np.bincount(regimes, weights=df2["netliq_z252"].to_numpy(dtype=float), minlength=3)
+    s_gcb = np.bincount(regimes, weights=df2["gcb_z252"].to_numpy(dtype=float), minlength=3)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        score = (s_net + s_gcb) / counts
+    order = np.argsort(-score, kind="stable")  # [más expansivo ... más contractivo]
+    mapping = {int(old): new for new, old in enumerate(order)}  # 0=expansivo,1=neutral,2=contractivo
     df2["regime"] = df2["regime_raw"].map(mapping)
 
     # Guardados
     out_parquet = OUT / "liquidity_regimes.parquet"
     out_csv = OUT / "liquidity_regimes.csv"
-    df2[["date", "regime", "regime_p0", "regime_p1", "regime_p2"]].to_parquet(out_parquet, index=False)
-    df2[["date", "regime", "regime_p0", "regime_p1", "regime_p2"]].to_csv(out_csv, index=False)
+    write_parquet(df2[["date", "regime", "regime_p0", "regime_p1", "regime_p2"]], out_parquet, keep64=KEEP64)
+    if EMIT_CSV:
+        df2[["date", "regime", "regime_p0", "regime_p1", "regime_p2"]].to_csv(out_csv, index=False)
 
-    print("[OK] Modelo de régimen entrenado (GMM 3 estados).")
+    print("[OK] Modelo de régimen entrenado (GMM 3 estados, diag).")
     print(f"     Parquet: {out_parquet}")
-    print(f"     CSV:     {out_csv}")
+    if EMIT_CSV:
+        print(f"     CSV:     {out_csv}")
 
     # Resumen
     counts = df2["regime"].value_counts().sort_index()
@@ -1,24 +1,38 @@
 from __future__ import annotations
 
+import os
 from pathlib import Path
 import numpy as np
 import pandas as pd
 
+from joblib import Parallel, delayed
 from sklearn.preprocessing import StandardScaler
 from hmmlearn.hmm import GaussianHMM # type: ignore
 
+from io_utils import read_features, write_parquet
+
 
 ROOT = Path(__file__).resolve().parents[1]
 FEATURES_DIR = ROOT / "data" / "features"
 MODELS_DIR = ROOT / "data" / "models"
 
+# CSV solo bajo demanda (EMIT_CSV=1); Parquet es la salida canónica
+EMIT_CSV = bool(os.getenv("EMIT_CSV"))
+
+# Probabilidades / z-scores: todo en float32 al escribir
+KEEP64: set[str] = set()
 
-def _order_states_by_expansiveness(df: pd.DataFrame, hidden_states: np.ndarray) -> dict[int, int]:
-    tmp = df.copy()
-    tmp["state"] = hidden_states
-    means = tmp.groupby("state")[["netliq_z252", "gcb_z252"]].mean()
-    score = means["netliq_z252"] + means["gcb_z252"]
-    order = score.sort_values(ascending=False).index.tolist()
+
+def _order_states_by_expansiveness(
+    df: pd.DataFrame, hidden_states: np.ndarray, n_states: int
+) -> dict[int, int]:
+    # Medias por estado con bincount (sin groupby); un estado vacío queda con score NaN -> al final
+    counts = np.bincount(hidden_states, minlength=n_states)
+    s_net = np.bincount(hidden_states, weights=df["netliq_z252"].to_numpy(dtype=float), minlength=n_states)
+    s_gcb = np.bincount(hidden_states, weights=df["gcb_z252"].to_numpy(dtype=float), minlength=n_states)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        score = (s_net + s_gcb) / counts
+    order = np.argsort(-score, kind="stable")
     return {int(old_state): int(new_regime) for new_regime, old_state in enumerate(order)}
 
 
@@ -33,6 +47,27 @@ def _smooth_transmat(model: GaussianHMM, eps: float = 1e-3) -> None:
     model.transmat_ = T
 
 
+def _fit_one(
+    Xs: np.ndarray,
+    seed: int,
+    n_components: int,
+    min_covar: float,
+    trans_smooth: float,
+) -> tuple[float, GaussianHMM]:
+    model = GaussianHMM(
+        n_components=n_components,
+        covariance_type="diag",
+        n_iter=500,
+        tol=1e-4,
+        random_state=seed,
+        verbose=False,
+        min_covar=min_covar,
+    )
+    model.fit(Xs)
+    _smooth_transmat(model, eps=trans_smooth)
+    return model.score(Xs), model
+
+
 def _fit_best_hmm(
     Xs: np.ndarray,
     n_components: int = 3,
@@ -40,25 +75,13 @@ def _fit_best_hmm(
     min_covar: float = 1e-2,
     trans_smooth: float = 1e-3,
 ) -> GaussianHMM:
-    best_model = None
-    best_score = -np.inf
-
-    for seed in range(42, 42 + n_tries):
-        model = GaussianHMM(
-            n_components=n_components,
-            covariance_type="diag",
-            n_iter=500,
-            tol=1e-4,
-            random_state=seed,
-            verbose=False,
-            min_covar=min_covar,
-        )
-        model.fit(Xs)
-        _smooth_transmat(model, eps=trans_smooth)
-        score = model.score(Xs)
-        if score > best_score:
-            best_score = score
-            best_model = model
+    # Reinicios aleatorios independientes -> en paralelo (un proceso por semilla)
+    results = Parallel(n_jobs=-1, backend="loky")(
+        delayed(_fit_one)(Xs, seed, n_components, min_covar, trans_smooth)
+        for seed in range(42, 42 + n_tries)
+    )
+    # max() se queda con la primera semilla en caso de empate (igual que el bucle secuencial)
+    best_score, best_model = max(results, key=lambda r: r[0])
 
     assert best_model is not None
     print(f"[INFO] Best HMM score: {best_score:.3f} | min_covar={min_covar} | trans_smooth={trans_smooth}")
@@ -72,7 +95,7 @@ def main() -> None:
     if not p.exists():
         raise SystemExit(f"[ERROR] Falta {p}. Ejecuta primero 05_build_gli_master.py")
 
-    df = pd.read_parquet(p).sort_values("date").reset_index(drop=True)
+    df = read_features(p).sort_values("date").reset_index(drop=True)
 
     # SOLO nivel + cambio (sin percentiles)
     feat_cols = [
@@ -104,7 +127,7 @@ def main() -> None:
     hidden_states = hmm.predict(Xs)
     post = hmm.predict_proba(Xs)
 
-    mapping = _order_states_by_expansiveness(df2, hidden_states)
+    mapping = _order_states_by_expansiveness(df2, hidden_states, n_states=post.shape[1])
     df2["state_raw"] = hidden_states
     df2["regime"] = df2["state_raw"].map(mapping).astype(int)
 
@@ -139,8 +162,9 @@ def main() -> None:
         "netliq_d1_z252",
         "gcb_d1_z252",
     ]
-    df2[cols_out].to_parquet(out_parquet, index=False)
-    df2[cols_out].to_csv(out_csv, index=False)
+    write_parquet(df2[cols_out], out_parquet, keep64=KEEP64)
+    if EMIT_CSV:
+        df2[cols_out].to_csv(out_csv, index=False)
 
     trans_df = pd.DataFrame(
         trans_regime,
@@ -151,7 +175,8 @@ def main() -> None:
 
     print("[OK] HMM entrenado (3 regímenes) - V3 (más suave).")
     print(f"     Parquet: {out_parquet}")
-    print(f"     CSV:     {out_csv}")
+    if EMIT_CSV:
+        print(f"     CSV:     {out_csv}")
     print(f"     Transition: {out_trans}")
 
     counts = df2["regime"].value_counts().sort_index()
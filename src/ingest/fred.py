@@ -1,16 +1,24 @@
 from __future__ import annotations
 import os
-import requests
 import pandas as pd
-from tenacity import retry, stop_after_attempt, wait_fixed
+import requests
+
+from ingest.session import make_session
 
-@retry(stop=stop_after_attempt(5), wait=wait_fixed(2))
-def _get(url: str, params: dict) -> dict:
-    r = requests.get(url, params=params, timeout=30)
+# Session compartida: reutiliza conexiones TLS entre series (reintentos en el adapter)
+_SESSION = make_session()
+
+def _get(url: str, params: dict, session: requests.Session | None = None) -> dict:
+    r = (session or _SESSION).get(url, params=params, timeout=30)
     r.raise_for_status()
     return r.json()
 
-def fetch_fred_series(series_id: str, start: str | None = None, end: str | None = None) -> pd.DataFrame:
+def fetch_fred_series(
+    series_id: str,
+    start: str | None = None,
+    end: str | None = None,
+    session: requests.Session | None = None,
+) -> pd.DataFrame:
     api_key = os.getenv("FRED_API_KEY")
     if not api_key:
         raise RuntimeError("Falta FRED_API_KEY en tu .env (FRED requiere API key).")
@@ -24,15 +32,34 @@ def fetch_fred_series(series_id: str, start: str | None = None, end: str | None
     if start: params["observation_start"] = start
     if end: params["observation_end"] = end
 
-    js = _get(url, params=params)
+    js = _get(url, params=params, session=session)
     obs = js.get("observations", [])
-    df = pd.DataFrame(obs)
-    if df.empty:
-        return df
+    if not obs:
+        return pd.DataFrame()
 
-    df = df[["date", "value"]].copy()
-    df["date"] = pd.to_datetime(df["date"], utc=True)
-    df["value"] = pd.to_numeric(df["value"], errors="coerce")
+    # Solo date/value (sin realtime_start/end ni columnas object intermedias)
+    dates = [o["date"] for o in obs]
+    vals = [o["value"] for o in obs]
+    df = pd.DataFrame({
+        "date": pd.to_datetime(dates, utc=True),
+        "value": pd.to_numeric(vals, errors="coerce"),
+    })
     df = df.dropna(subset=["value"]).sort_values("date")
     df["series_id"] = series_id
     return df
+
+def fetch_fred_last_updated(series_id: str, session: requests.Session | None = None) -> str | None:
+    """
+    Campo 'last_updated' de la metadata de la serie (FRED no soporta
+    ETag / If-Modified-Since): petición mínima para saber si hubo cambios.
+    """
+    api_key = os.getenv("FRED_API_KEY")
+    if not api_key:
+        raise RuntimeError("Falta FRED_API_KEY en tu .env (FRED requiere API key).")
+
+    url = "https://api.stlouisfed.org/fred/series"
+    js = _get(url, params={"series_id": series_id, "api_key": api_key, "file_type": "json"}, session=session)
+    series = js.get("seriess", [])
+    if not series:
+        return None
+    return series[0].get("last_updated")
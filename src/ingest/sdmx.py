@@ -3,6 +3,8 @@ from __future__ import annotations
 import pandas as pd
 import requests
 
+from ingest.session import make_session
+
 # Endpoints SDMX REST (SDMX-JSON) más comunes
 BASE_URLS = {
     "ECB": "https://data-api.ecb.europa.eu/service/data",   # ECB Data Portal API
@@ -10,6 +12,9 @@ BASE_URLS = {
     "IMF": "https://dataservices.imf.org/REST/SDMX_JSON.svc/CompactData",  # IMF SDMX-JSON
 }
 
+# Session compartida: keep-alive entre peticiones + reintentos con backoff
+_SESSION = make_session()
+
 def _to_float(x):
     try:
         return float(x)
@@ -22,6 +27,7 @@ def fetch_sdmx_series_http(
     key: str,
     start: str | None = None,
     end: str | None = None,
+    session: requests.Session | None = None,
 ) -> pd.DataFrame:
     """
     Descarga una serie SDMX y la normaliza a columnas:
@@ -31,7 +37,9 @@ def fetch_sdmx_series_http(
     flow: dataset/dataflow id
     key:  clave SDMX (dim1.dim2....)
     start/end: YYYY or YYYY-MM or YYYY-MM-DD (según proveedor)
+    session: Session HTTP compartida (por defecto la del módulo)
     """
+    http = session or _SESSION
     source = source.upper()
     if source not in BASE_URLS:
         raise ValueError(f"source inválido: {source}. Usa: {list(BASE_URLS)}")
@@ -48,7 +56,7 @@ def fetch_sdmx_series_http(
 
         # Pedimos SDMX-JSON
         headers = {"Accept": "application/vnd.sdmx.data+json;version=1.0.0-wd"}
-        r = requests.get(url, params=params, headers=headers, timeout=60)
+        r = http.get(url, params=params, headers=headers, timeout=60)
         r.raise_for_status()
         js = r.json()
 
@@ -105,7 +113,7 @@ def fetch_sdmx_series_http(
         if end:
             params["endPeriod"] = end
 
-        r = requests.get(url, params=params, timeout=60)
+        r = http.get(url, params=params, timeout=60)
         r.raise_for_status()
         js = r.json()
 
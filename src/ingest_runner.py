@@ -0,0 +1,371 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+from concurrent.futures import Executor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from datetime import datetime, timezone
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+from tqdm import tqdm
+
+from io_utils import (
+    append_log,
+    append_series_part,
+    clear_series_parts,
+    compact_series,
+    digest_path,
+    read_yaml_cached,
+    series_parts,
+    table_digest,
+    write_table,
+)
+
+
+# --------------------------------------------------------------------------------------
+# Paths
+# --------------------------------------------------------------------------------------
+ROOT = Path(__file__).resolve().parents[1]  # .../global_liquidity
+CONFIGS = ROOT / "configs"
+DATA_BRONZE = ROOT / "data" / "bronze"
+MANIFESTS = ROOT / "manifests"
+# Log de ingesta: Arrow IPC append-only (un stream por ejecución)
+INGEST_LOG_PATH = MANIFESTS / "ingest_log.arrow"
+# last_updated de FRED por serie en la última descarga (para saltar series sin cambios)
+FRED_STATE_PATH = MANIFESTS / "fred_last_updated.json"
+
+FRED_CFG_PATH = CONFIGS / "series_fred.yaml"
+SDMX_CFG_PATH = CONFIGS / "sdmx.yaml"
+
+# Descargas concurrentes (I/O de red): hilos del pool compartido
+MAX_WORKERS = 8
+
+MODES = ("full", "incremental")
+
+
+# --------------------------------------------------------------------------------------
+# Helpers
+# --------------------------------------------------------------------------------------
+def _die(msg: str, code: int = 1) -> None:
+    print(msg, file=sys.stderr)
+    raise SystemExit(code)
+
+
+def _read_yaml(path: Path) -> dict:
+    if not path.exists():
+        _die(f"[ERROR] No existe el archivo de config: {path}")
+
+    cfg = read_yaml_cached(path)
+
+    if cfg is None:
+        text = path.read_text(encoding="utf-8")
+        _die(
+            f"[ERROR] YAML vacío o inválido: {path}\n"
+            f"Contenido (primeros 400 chars):\n{text[:400]}"
+        )
+    if not isinstance(cfg, dict):
+        _die(f"[ERROR] YAML no es un dict (estructura inesperada): {path}")
+
+    return cfg
+
+
+def _ensure_dir(p: Path) -> None:
+    p.mkdir(parents=True, exist_ok=True)
+
+
+def _run_parallel(ex: Executor, fn, items: list, desc: str) -> list:
+    """
+    Ejecuta fn(item) en el pool `ex` (descarga + escritura por item).
+    Devuelve los resultados en el orden de `items`, sin los None.
+    """
+    if not items:
+        return []
+    results: list = [None] * len(items)
+    futures = {ex.submit(fn, item): i for i, item in enumerate(items)}
+    # Barra tqdm solo en terminal; sin TTY (CI, logs), un contador cada ~10%
+    tty = sys.stderr.isatty()
+    every = max(1, len(items) // 10)
+    for n, fut in enumerate(tqdm(as_completed(futures), total=len(futures), desc=desc, disable=not tty), 1):
+        results[futures[fut]] = fut.result()
+        if not tty and (n % every == 0 or n == len(items)):
+            print(f"[INFO] {desc}: {n}/{len(items)}")
+    return [r for r in results if r is not None]
+
+
+# --------------------------------------------------------------------------------------
+# Bronze: snapshot completo (full) / deltas (incremental)
+# --------------------------------------------------------------------------------------
+def _save_parquet(df: pd.DataFrame, outpath: Path) -> bool:
+    """
+    Escribe el snapshot salvo que el contenido sea idéntico al ya escrito
+    (digest en el sidecar .blake y sin deltas pendientes). True si escribe.
+    """
+    _ensure_dir(outpath.parent)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    digest = table_digest(table)
+    sidecar = digest_path(outpath)
+    if (
+        outpath.exists()
+        and sidecar.exists()
+        and not series_parts(outpath)
+        and sidecar.read_text(encoding="utf-8").strip() == digest
+    ):
+        return False
+
+    # sidecar fuera antes de escribir y de vuelta al final: un corte a mitad solo fuerza reescribir
+    sidecar.unlink(missing_ok=True)
+    # zstd + estadísticas (PARQUET_WRITE_OPTS) en lugar de los defaults snappy de pandas
+    write_table(table, outpath)
+    # snapshot completo: descarta los deltas de la ingesta incremental
+    clear_series_parts(outpath)
+    tmp = sidecar.with_suffix(".blake.tmp")
+    tmp.write_text(digest, encoding="utf-8")
+    os.replace(tmp, sidecar)
+    return True
+
+
+def _max_date_in_parquet(path: Path) -> pd.Timestamp | None:
+    if not path.exists():
+        return None
+    # Máximo desde las estadísticas del footer (sin decodificar páginas)
+    pf = pq.ParquetFile(path)
+    meta = pf.metadata
+    idx = pf.schema_arrow.get_field_index("date")
+    if meta.num_rows == 0 or idx < 0:
+        return None
+    stats = [meta.row_group(i).column(idx).statistics for i in range(meta.num_row_groups)]
+    if all(st is not None and st.has_min_max for st in stats):
+        ts = pd.Timestamp(max(st.max for st in stats))
+        return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+    # Sin estadísticas: lectura completa de la columna
+    df = pd.read_parquet(path, columns=["date"])
+    d = pd.to_datetime(df["date"], utc=True, errors="coerce").dropna()
+    if d.empty:
+        return None
+    return d.max()
+
+
+def _series_files(path: Path) -> list[Path]:
+    # snapshot <serie>.parquet (si existe) + part-files delta
+    return ([path] if path.exists() else []) + series_parts(path)
+
+
+def _last_date(path: Path) -> pd.Timestamp | None:
+    dates = [d for f in _series_files(path) if (d := _max_date_in_parquet(f)) is not None]
+    return max(dates) if dates else None
+
+
+def _next_start(path: Path, cfg_start: str | None) -> tuple[pd.Timestamp | None, str | None]:
+    # Si ya hay datos, pedimos desde el día siguiente
+    last = _last_date(path)
+    if last is None:
+        return None, cfg_start
+    return last, (last + pd.Timedelta(days=1)).date().isoformat()
+
+
+def _rows_stored(path: Path) -> int:
+    # filas en disco (snapshot + deltas, del footer): sin dedupe, un delta que solapa cuenta doble
+    return sum(pq.ParquetFile(f).metadata.num_rows for f in _series_files(path))
+
+
+def _load_fred_state() -> dict[str, str]:
+    if not FRED_STATE_PATH.exists():
+        return {}
+    try:
+        return json.loads(FRED_STATE_PATH.read_text(encoding="utf-8"))
+    except ValueError:
+        print(f"[WARN] Estado FRED ilegible ({FRED_STATE_PATH}). Se regenera.")
+        return {}
+
+
+def _fred_series_columns(fred_cfg: dict) -> tuple[list[str], list[str | None], list[str | None]]:
+    """
+    Valida fred.series una sola vez y lo devuelve en columnas (sid, start,
+    end): el pool recibe tuplas planas, sin dict.get por serie.
+    """
+    if "fred" not in fred_cfg or not isinstance(fred_cfg["fred"], dict):
+        _die(f"[ERROR] Estructura inválida en {FRED_CFG_PATH}: falta clave 'fred'.")
+
+    series_cfg = fred_cfg["fred"].get("series")
+    if not isinstance(series_cfg, dict):
+        _die(
+            f"[ERROR] Estructura inválida en {FRED_CFG_PATH}: falta 'fred: series:' como dict.\n"
+            f"Ejemplo mínimo:\n"
+            f"fred:\n  series:\n    WALCL: {{name: '...', freq: 'weekly'}}"
+        )
+    if not series_cfg:
+        _die(f"[ERROR] No hay series definidas en {FRED_CFG_PATH} (fred.series está vacío).")
+
+    metas = [m or {} for m in series_cfg.values()]
+    bad = [sid for sid, m in zip(series_cfg, metas) if not isinstance(m, dict)]
+    if bad:
+        _die(f"[ERROR] Estructura inválida en {FRED_CFG_PATH}: series sin dict de metadata: {bad}")
+
+    sids = [str(sid) for sid in series_cfg]
+    starts = [m.get("start") for m in metas]
+    ends = [m.get("end") for m in metas]
+    return sids, starts, ends
+
+
+def _sdmx_items() -> list[dict]:
+    """Items de configs/sdmx.yaml; lista vacía si no hay (SDMX es opcional)."""
+    if not SDMX_CFG_PATH.exists():
+        print("[INFO] No existe configs/sdmx.yaml → SDMX omitido (solo FRED).")
+        return []
+    try:
+        sdmx_cfg = _read_yaml(SDMX_CFG_PATH)
+    except SystemExit:
+        # Si existe pero está mal, lo reportamos y seguimos (no bloqueamos FRED)
+        print(f"[WARN] SDMX config inválida: {SDMX_CFG_PATH}. Se omite SDMX.")
+        return []
+
+    series_list = sdmx_cfg.get("series", [])
+    if not isinstance(series_list, list):
+        print("[WARN] SDMX config: 'series' no es una lista. Se omite SDMX.")
+        return []
+    if not series_list:
+        print("[INFO] SDMX config existe pero no tiene series. Se omite SDMX.")
+    return series_list
+
+
+# --------------------------------------------------------------------------------------
+# Run
+# --------------------------------------------------------------------------------------
+def run(mode: str, compact: bool = False) -> None:
+    """
+    Ingesta FRED (+ SDMX opcional) a bronze.
+      mode="full":        snapshot completo por serie (salta las que no cambian)
+      mode="incremental": solo filas nuevas, como part-files delta
+    compact (solo incremental): funde después los deltas en <serie>.parquet.
+    Una sola Session HTTP (keep-alive) y un solo pool de hilos para todo.
+    """
+    if mode not in MODES:
+        _die(f"[ERROR] Modo de ingesta inválido: {mode!r}. Usa: {MODES}")
+    incremental = mode == "incremental"
+
+    load_dotenv(ROOT / ".env")
+    _ensure_dir(DATA_BRONZE)
+    _ensure_dir(MANIFESTS)
+
+    logs: list[dict] = []
+    # Un único timestamp lógico para todas las filas de esta ejecución
+    ts_utc = datetime.now(timezone.utc).isoformat()
+
+    # Import aquí para que el error sea localizado
+    from ingest.fred import fetch_fred_last_updated, fetch_fred_series
+    from ingest.session import make_session
+
+    session = make_session()
+    sids, starts, ends = _fred_series_columns(_read_yaml(FRED_CFG_PATH))
+    fred_state = _load_fred_state() if incremental else {}
+
+    # -------------------------
+    # FRED (obligatorio)
+    # -------------------------
+    def fetch_fred(item: tuple[str, str | None, str | None]) -> dict:
+        sid, cfg_start, end = item
+        out = DATA_BRONZE / "fred" / f"{sid}.parquet"
+        row = {"ts_utc": ts_utc, "source": "FRED", "dataset": sid}
+
+        if not incremental:
+            df = fetch_fred_series(sid, start=cfg_start, end=end, session=session)
+            written = _save_parquet(df, out)
+            return {**row, "rows": int(len(df)), "skipped": not written, "path": str(out)}
+
+        last, start = _next_start(out, cfg_start)
+
+        # Serie sin cambios en FRED desde la última descarga: ni observaciones ni escritura
+        last_updated = fetch_fred_last_updated(sid, session=session)
+        if last is not None and last_updated is not None and fred_state.get(sid) == last_updated:
+            return {**row, "rows_new": 0, "skipped": True, "last_updated": last_updated, "path": str(out)}
+
+        df_new = fetch_fred_series(sid, start=start, end=end, session=session)
+        if df_new is None or df_new.empty:
+            if last is not None and last_updated is not None:
+                fred_state[sid] = last_updated
+            return {**row, "rows_new": 0, "skipped": False, "last_updated": last_updated, "path": str(out)}
+
+        # Delta como part-file nuevo: no se relee ni reescribe el histórico
+        append_series_part(df_new, out)
+        if last_updated is not None:
+            fred_state[sid] = last_updated
+
+        return {**row, "rows_new": int(len(df_new)), "rows_stored": _rows_stored(out),
+                "skipped": False, "last_updated": last_updated, "path": str(out)}
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
+        desc = "FRED incremental" if incremental else "FRED"
+        logs.extend(_run_parallel(ex, fetch_fred, list(zip(sids, starts, ends)), desc=desc))
+        if incremental:
+            FRED_STATE_PATH.write_text(json.dumps(fred_state, indent=2, sort_keys=True), encoding="utf-8")
+
+        # -------------------------
+        # SDMX (opcional)
+        # -------------------------
+        series_list = _sdmx_items()
+        fetch_sdmx_series = None
+        if series_list:
+            # Import lazy: si SDMX rompe, que no bloquee FRED
+            try:
+                from ingest.sdmx import fetch_sdmx_series_http as fetch_sdmx_series
+            except Exception as e:
+                print(
+                    "[WARN] No se pudo importar ingest.sdmx (se omite SDMX).\n"
+                    f"       Motivo: {type(e).__name__}: {e}"
+                )
+
+        def fetch_sdmx(item: dict) -> dict | None:
+            # Validación mínima de item
+            missing = [k for k in ("source", "flow", "key") if k not in item]
+            if missing:
+                print(f"[WARN] SDMX item inválido, falta {missing}: {item}")
+                return None
+
+            safe_name = item.get("name") or f'{item["source"]}_{item["flow"]}'
+            out = DATA_BRONZE / "sdmx" / f"{safe_name}.parquet"
+            row = {"ts_utc": ts_utc, "source": str(item["source"]), "dataset": str(safe_name)}
+
+            start = _next_start(out, item.get("start"))[1] if incremental else item.get("start")
+            # SDMX es opcional: un fallo HTTP/parseo omite la serie, no corta la ingesta
+            try:
+                df = fetch_sdmx_series(
+                    source=item["source"],
+                    flow=item["flow"],
+                    key=item["key"],
+                    start=start,
+                    end=item.get("end"),
+                    session=session,
+                )
+            except Exception as e:
+                print(f"[WARN] SDMX {safe_name} omitido. Motivo: {type(e).__name__}: {e}")
+                return None
+
+            if not incremental:
+                written = _save_parquet(df, out)
+                return {**row, "rows": int(len(df)), "skipped": not written, "path": str(out)}
+
+            if df is None or df.empty:
+                return {**row, "rows_new": 0, "path": str(out)}
+            append_series_part(df, out)
+            return {**row, "rows_new": int(len(df)), "rows_stored": _rows_stored(out), "path": str(out)}
+
+        if fetch_sdmx_series is not None:
+            desc = "SDMX incremental" if incremental else "SDMX"
+            logs.extend(_run_parallel(ex, fetch_sdmx, series_list, desc=desc))
+
+        # --compact (p. ej. mensual): funde los deltas en <serie>.parquet
+        if incremental and compact:
+            paths = list(dict.fromkeys(Path(r["path"]) for r in logs))
+            compacted = _run_parallel(ex, compact_series, paths, desc="Compact")
+            print(f"[INFO] Series compactadas: {len(compacted)}")
+
+    append_log(logs, INGEST_LOG_PATH)
+
+    print("\n[OK] Ingestión incremental terminada." if incremental else "\n[OK] Ingestión terminada.")
+    print(f"     Bronze:  {DATA_BRONZE}")
+    print(f"     Log:     {INGEST_LOG_PATH}")
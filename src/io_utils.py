@@ -0,0 +1,342 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from uuid import uuid4
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import yaml
+
+# Parser C de libyaml si PyYAML se compiló con él (5-10x más rápido)
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # PyYAML sin libyaml
+    from yaml import SafeLoader as _YamlLoader
+
+
+# Parquet: zstd + row groups acotados (mejor compresión y scans más rápidos
+# que los defaults de pandas/snappy para estas series temporales estrechas)
+PARQUET_WRITE_OPTS = {
+    "compression": "zstd",
+    "compression_level": 3,
+    "row_group_size": 65_536,
+    "data_page_size": 1 << 20,
+    "use_dictionary": True,
+    "write_statistics": True,
+}
+
+
+def downcast_floats(table: pa.Table, keep64: Iterable[str]) -> pa.Table:
+    """
+    Pasa a float32 las columnas float64 salvo las de `keep64` (niveles en
+    millones donde el redondeo a ~7 dígitos sí importa). Mitad de bytes
+    en disco y en lectura para z-scores, percentiles, FX, deltas...
+    """
+    keep = set(keep64)
+    schema = pa.schema(
+        [
+            f.with_type(pa.float32()) if pa.types.is_float64(f.type) and f.name not in keep else f
+            for f in table.schema
+        ],
+        metadata=table.schema.metadata,
+    )
+    return table.cast(schema)
+
+
+def write_table(table: pa.Table, path: Path, keep64: Iterable[str] | None = None) -> None:
+    # keep64=None: se escribe tal cual; si no, float32 salvo esas columnas
+    if keep64 is not None:
+        table = downcast_floats(table, keep64)
+    # tmp + os.replace (atómico): una escritura cortada no deja un Parquet corrupto
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    pq.write_table(table, tmp, **PARQUET_WRITE_OPTS)
+    os.replace(tmp, path)
+
+
+def write_parquet(df: pd.DataFrame, path: Path, keep64: Iterable[str] | None = None) -> None:
+    write_table(pa.Table.from_pandas(df, preserve_index=False), path, keep64=keep64)
+
+
+def write_feather(df: pd.DataFrame, path: Path, keep64: Iterable[str] | None = None) -> None:
+    """
+    Copia Arrow IPC (feather v2, sin comprimir) del mismo frame, para que
+    los consumidores la lean por memory_map sin decodificar Parquet.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if keep64 is not None:
+        table = downcast_floats(table, keep64)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)
+
+
+def read_features(parquet_path: Path) -> pd.DataFrame:
+    """
+    Lee un dataset de features: usa la copia .feather (memory_map, sin
+    descompresión) si existe y no es más antigua que el Parquet.
+    """
+    ipc_path = parquet_path.with_suffix(".feather")
+    if ipc_path.exists() and ipc_path.stat().st_mtime >= parquet_path.stat().st_mtime:
+        with pa.memory_map(str(ipc_path)) as source:
+            return pa.ipc.open_file(source).read_all().to_pandas()
+    return pd.read_parquet(parquet_path)
+
+
+# Bronze: date naive (UTC) + value float64, cast en Arrow (sin pd.to_numeric)
+SERIES_SCHEMA = pa.schema([("date", pa.timestamp("ns")), ("value", pa.float64())])
+
+
+def table_digest(table: pa.Table) -> str:
+    """blake2b (128 bits) del stream Arrow IPC de la tabla: schema + datos."""
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return hashlib.blake2b(sink.getvalue(), digest_size=16).hexdigest()
+
+
+def digest_path(path: Path) -> Path:
+    # sidecar con el digest del contenido escrito en <serie>.parquet
+    return path.with_suffix(".blake")
+
+
+def _part_name() -> str:
+    # timestamp UTC (ordena por escritura) + uuid (sin colisiones entre procesos)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    return f"part-{stamp}-{uuid4().hex}.parquet"
+
+
+def series_parts(path: Path) -> list[Path]:
+    """
+    Part-files delta de una serie bronze (<serie>/part-*.parquet junto a
+    <serie>.parquet), en orden de escritura.
+    """
+    return sorted(path.with_suffix("").glob("part-*.parquet"))
+
+
+def append_series_part(df: pd.DataFrame, path: Path) -> Path:
+    """
+    Añade filas nuevas a una serie bronze como part-file delta, sin releer
+    ni reescribir <serie>.parquet. read_series() las une (la última gana).
+    """
+    part_dir = path.with_suffix("")
+    part_dir.mkdir(parents=True, exist_ok=True)
+    out = part_dir / _part_name()
+    write_parquet(df, out)
+    return out
+
+
+def clear_series_parts(path: Path) -> None:
+    # tras reescribir <serie>.parquet completo, los deltas sobran
+    for part in series_parts(path):
+        part.unlink()
+
+
+def _dedupe_last(table: pa.Table, keys: list[str]) -> pa.Table:
+    """Una fila por clave: la última en orden de tabla (group_by + max del nº de fila)."""
+    rows = table.append_column("_row", pa.array(np.arange(table.num_rows)))
+    last = rows.group_by(keys).aggregate([("_row", "max")])["_row_max"]
+    return table.take(last.sort())
+
+
+def compact_series(path: Path) -> int | None:
+    """
+    Funde <serie>.parquet + sus deltas en un único <serie>.parquet (dedupe
+    por fecha[/series_id], gana el último escrito) y borra los deltas.
+    Devuelve las filas resultantes, o None si no había deltas.
+    """
+    parts = series_parts(path)
+    if not parts:
+        return None
+    files = ([path] if path.exists() else []) + parts
+    # concat_tables es zero-copy: la única copia completa es el take() del dedupe
+    tbl = pa.concat_tables([pq.read_table(f) for f in files], promote_options="permissive")
+
+    # Todo en kernels Arrow: fecha a UTC, sin nulos, dedupe y orden
+    date = tbl["date"]
+    if pa.types.is_timestamp(date.type):
+        date = date.cast(pa.timestamp(date.type.unit, "UTC"))  # naive => UTC
+    else:
+        date = pa.array(pd.to_datetime(date.to_pandas(), utc=True, errors="coerce"))
+    tbl = tbl.set_column(tbl.schema.get_field_index("date"), "date", date)
+    tbl = tbl.filter(pc.is_valid(tbl["date"]))
+    keys = ["date", "series_id"] if "series_id" in tbl.column_names else ["date"]
+    tbl = _dedupe_last(tbl, keys).sort_by("date")
+
+    # write_table es atómico: si se corta a mitad, <serie>.parquet y sus deltas siguen intactos
+    write_table(tbl, path)
+    digest_path(path).unlink(missing_ok=True)  # el digest ya no describe el fichero
+    clear_series_parts(path)
+    return tbl.num_rows
+
+
+def read_series(path: Path, name: str) -> pd.Series:
+    """
+    Lee una serie bronze (date, value) y la devuelve como pd.Series
+    indexada por fecha. Solo materializa esas dos columnas. Incluye los
+    part-files delta de la ingesta incremental (fecha repetida: gana el
+    último escrito).
+    """
+    parts = series_parts(path)
+    files = ([path] if path.exists() else []) + parts
+    if not files:
+        raise SystemExit(f"[ERROR] No existe: {path}")
+
+    for f in files:
+        cols = pq.read_schema(f).names
+        if "date" not in cols or "value" not in cols:
+            raise SystemExit(f"[ERROR] Formato inesperado en {f}. Columnas: {cols}")
+
+    tables = [pq.read_table(f, columns=["date", "value"]).cast(SERIES_SCHEMA, safe=False) for f in files]
+    tbl = pa.concat_tables(tables)
+    # En Arrow: dedupe (solo si hay deltas; mismo criterio que compact_series),
+    # sin nulos / NaN (como dropna) y orden
+    if parts:
+        tbl = _dedupe_last(tbl, ["date"])
+    tbl = tbl.filter(pc.and_(pc.is_valid(tbl["date"]), pc.invert(pc.is_nan(tbl["value"]))))
+    df = tbl.sort_by("date").to_pandas()
+    return df.set_index("date")["value"].rename(name)
+
+
+def read_series_many(items: list[tuple[Path, str]]) -> list[pd.Series]:
+    """
+    read_series() para varios (path, name) en paralelo: la lectura Parquet
+    libera el GIL. Devuelve las series en el mismo orden que `items`.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, len(items))) as ex:
+        return list(ex.map(lambda item: read_series(*item), items))
+
+
+# Marca de fin de stream IPC (continuation token + longitud 0)
+_IPC_EOS = b"\xff\xff\xff\xff\x00\x00\x00\x00"
+
+
+def _scan_log(log_path: Path) -> tuple[list[pa.Table], int]:
+    """
+    Streams IPC completos del log, en orden, y el offset donde termina el
+    último. Un stream sin EOS (append cortado a mitad) cierra el escaneo.
+    """
+    tables: list[pa.Table] = []
+    end = 0
+    with pa.memory_map(str(log_path)) as source:
+        size = source.size()
+        while end < size:
+            try:
+                table = pa.ipc.open_stream(source).read_all()
+            except (pa.ArrowInvalid, OSError):
+                break
+            pos = source.tell()
+            source.seek(pos - len(_IPC_EOS))
+            if source.read(len(_IPC_EOS)) != _IPC_EOS:
+                break
+            tables.append(table)
+            end = pos
+    return tables, end
+
+
+def _ends_with_eos(log_path: Path) -> bool:
+    # el último append terminó entero: fichero vacío o acabado en EOS (lectura de 8 bytes)
+    size = log_path.stat().st_size
+    if size == 0:
+        return True
+    if size < len(_IPC_EOS):
+        return False
+    with log_path.open("rb") as f:
+        f.seek(-len(_IPC_EOS), os.SEEK_END)
+        return f.read() == _IPC_EOS
+
+
+def append_log(rows: list[dict], log_path: Path) -> None:
+    """
+    Añade filas al log (Arrow IPC): cada ejecución se añade al final del
+    fichero como un stream IPC completo (schema + batch + EOS), en modo
+    "ab". Sin reescribir lo anterior ni footer que recomponer. Si el
+    último append quedó cortado, se trunca antes de escribir: los streams
+    posteriores no quedan detrás de bytes ilegibles.
+    """
+    if not rows:
+        return
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # from_pylist infiere columnas de la primera fila: unión de claves (None si falta)
+    keys = list(dict.fromkeys(k for r in rows for k in r))
+    table = pa.Table.from_pylist([{k: r.get(k) for k in keys} for r in rows])
+
+    # stream serializado en memoria y añadido con un único write
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+
+    if log_path.exists() and not _ends_with_eos(log_path):
+        # solo sin EOS final se escanea el log entero (O(tamaño)) para truncar
+        _, end = _scan_log(log_path)
+        size = log_path.stat().st_size
+        if end < size:
+            print(f"[WARN] Cola cortada en {log_path} ({size - end} bytes); se trunca antes de añadir.")
+            with log_path.open("r+b") as f:
+                f.truncate(end)
+    with log_path.open("ab") as f:
+        f.write(sink.getvalue().to_pybytes())
+
+
+def _legacy_log_files(log_path: Path) -> list[Path]:
+    # formatos anteriores del log, junto a <log>.arrow: ingest_log.parquet
+    # (reescrito en cada ejecución) e ingest_log/part-*.parquet (dataset append-only)
+    single = log_path.with_suffix(".parquet")
+    return ([single] if single.exists() else []) + sorted(log_path.with_suffix("").glob("part-*.parquet"))
+
+
+def read_log(log_path: Path) -> pd.DataFrame:
+    """
+    Log completo: el histórico en formatos anteriores (solo lectura, ver
+    _legacy_log_files) seguido de los streams IPC del log actual, leídos
+    por memory_map.
+    """
+    tables = [pq.read_table(f) for f in _legacy_log_files(log_path)]
+    if log_path.exists():
+        streams, end = _scan_log(log_path)
+        if end < log_path.stat().st_size:
+            # solo puede ser la cola: append_log trunca antes de añadir
+            print(f"[WARN] Cola truncada en {log_path}; se ignora.")
+        tables.extend(streams)
+    if not tables:
+        return pd.DataFrame()
+    # permissive: el log antiguo puede traer otros tipos (p. ej. rows_total en vez de rows_stored)
+    return pa.concat_tables(tables, promote_options="permissive").to_pandas()
+
+
+def read_yaml_cached(path: Path):
+    """
+    YAML (SafeLoader, en C si hay libyaml) de `path` con caché pickle en <dir>/.cache/<nombre>.pkl,
+    válida mientras no cambien mtime/tamaño del YAML.
+    """
+    st = path.stat()
+    key = (st.st_mtime_ns, st.st_size)
+    cache_path = path.parent / ".cache" / f"{path.name}.pkl"
+
+    if cache_path.exists():
+        try:
+            with cache_path.open("rb") as f:
+                cached_key, data = pickle.load(f)
+            if cached_key == key:
+                return data
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            pass  # caché corrupta: se regenera
+
+    data = yaml.load(path.read_text(encoding="utf-8"), Loader=_YamlLoader)
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with cache_path.open("wb") as f:
+            pickle.dump((key, data), f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        pass  # sin permisos de escritura: sin caché
+    return data
@@ -1,7 +1,11 @@
 from __future__ import annotations
 
-import subprocess
+import importlib
+import io
 import sys
+import threading
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 from datetime import datetime
 
@@ -9,42 +13,163 @@ from datetime import datetime
 ROOT = Path(__file__).resolve().parents[1]
 SRC = ROOT / "src"
 
-PIPELINE = [
+# DAG: paso -> (módulo en src/ con main(), dependencias). Los pasos se
+# ejecutan en este mismo proceso (sin re-importar pandas/pyarrow por paso);
+# los que ya tienen sus dependencias listas corren en paralelo en hilos.
+PIPELINE: dict[str, tuple[str, tuple[str, ...]]] = {
     # 1) Ingest incremental
-    [sys.executable, str(SRC / "run_ingest_incremental.py")],
+    "ingest": ("run_ingest_incremental", ()),
 
     # 2) Builds
-    [sys.executable, str(SRC / "02_build_net_liquidity.py")],
-    [sys.executable, str(SRC / "03_build_net_liquidity_fixed_units.py")],
-    [sys.executable, str(SRC / "04_build_global_cb_assets_usd.py")],
-    [sys.executable, str(SRC / "05_build_gli_master.py")],
+    "build_nl": ("02_build_net_liquidity", ("ingest",)),
+    "build_nl_fixed": ("03_build_net_liquidity_fixed_units", ("ingest",)),
+    "build_cb": ("04_build_global_cb_assets_usd", ("ingest",)),
+    "gli": ("05_build_gli_master", ("build_nl", "build_nl_fixed", "build_cb")),
 
     # 3) Modelo HMM
-    [sys.executable, str(SRC / "07_train_liquidity_regime_hmm.py")],
-]
+    "hmm": ("07_train_liquidity_regime_hmm", ("gli",)),
+}
 
-def run_step(cmd: list[str]) -> None:
-    print("\n" + "=" * 90)
-    print("[RUN]", " ".join(cmd))
+
+class _ThreadStream(io.TextIOBase):
+    """
+    stdout/stderr por hilo: mientras un paso en paralelo captura, lo que
+    imprime su propio hilo va a su buffer (se vuelca entero al terminar);
+    el resto va al stream real. Los hilos que lance ese paso escriben
+    directamente en el stream real.
+    """
+
+    def __init__(self, real):
+        self._real = real
+        self._local = threading.local()
+
+    def capture(self, buf: io.StringIO) -> None:
+        self._local.buf = buf
+
+    def release(self) -> None:
+        self._local.buf = None
+
+    def write(self, s: str) -> int:
+        buf = getattr(self._local, "buf", None)
+        return (buf if buf is not None else self._real).write(s)
+
+    def flush(self) -> None:
+        self._real.flush()
+
+    # tqdm / loky consultan el stream real (TTY, descriptor)
+    def isatty(self) -> bool:
+        return self._real.isatty()
+
+    def fileno(self) -> int:
+        return self._real.fileno()
+
+
+_PRINT_LOCK = threading.Lock()
+
+
+def _ancestors(name: str) -> set[str]:
+    out: set[str] = set()
+    stack = list(PIPELINE[name][1])
+    while stack:
+        d = stack.pop()
+        if d not in out:
+            out.add(d)
+            stack.extend(PIPELINE[d][1])
+    return out
+
+
+def _concurrent_steps() -> set[str]:
+    """Pasos que pueden coincidir con otro (ni ancestro ni descendiente): 02/03/04."""
+    anc = {name: _ancestors(name) for name in PIPELINE}
+    return {
+        a for a in PIPELINE
+        if any(b != a and b not in anc[a] and a not in anc[b] for b in PIPELINE)
+    }
+
+
+def run_step(name: str, module: str, streams: tuple[_ThreadStream, ...], buffered: bool) -> None:
+    """
+    Ejecuta module.main(). Los pasos que corren solos (ingest, 05, 07)
+    imprimen en directo (contadores de progreso visibles en CI/cron); los
+    que pueden coincidir con otros se bufferizan (stdout + stderr de su
+    hilo) y se vuelcan en bloque al terminar.
+    """
+    with _PRINT_LOCK:
+        print(f"[RUN] {name}: {module}.main()")
+        if not buffered:
+            print("\n" + "=" * 90)
+            print(f"[{name}] {module}")
     start = datetime.now()
 
-    p = subprocess.run(cmd)
+    buf = io.StringIO()
+    if buffered:
+        for st in streams:
+            st.capture(buf)
+    code = 0
+    try:
+        importlib.import_module(module).main()
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            code = e.code if isinstance(e.code, int) else 1
+            print(e.code if isinstance(e.code, str) else "")
+    except Exception:
+        code = 1
+        traceback.print_exc(file=sys.stdout)
+    finally:
+        for st in streams:
+            st.release()
 
     elapsed = (datetime.now() - start).total_seconds()
-    if p.returncode != 0:
-        print(f"[FAIL] code={p.returncode} elapsed={elapsed:.1f}s")
-        raise SystemExit(p.returncode)
+    with _PRINT_LOCK:
+        if buffered:
+            print("\n" + "=" * 90)
+            print(f"[{name}] {module}")
+            print(buf.getvalue(), end="")
+        if code != 0:
+            print(f"[FAIL] {name} code={code} elapsed={elapsed:.1f}s")
+            raise SystemExit(code)
+        print(f"[OK] {name} elapsed={elapsed:.1f}s")
 
-    print(f"[OK] elapsed={elapsed:.1f}s")
 
 def main() -> None:
-    for cmd in PIPELINE:
-        run_step(cmd)
+    # imports en el hilo principal (y errores de import antes de empezar)
+    if str(SRC) not in sys.path:
+        sys.path.insert(0, str(SRC))
+    for module, _ in PIPELINE.values():
+        importlib.import_module(module)
+
+    streams = (_ThreadStream(sys.stdout), _ThreadStream(sys.stderr))
+    sys.stdout, sys.stderr = streams
+    concurrent = _concurrent_steps()
+
+    pending = dict(PIPELINE)
+    done: set[str] = set()
+    running = {}
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(PIPELINE)) as ex:
+            while pending or running:
+                for name, (module, deps) in list(pending.items()):
+                    if all(d in done for d in deps):
+                        fut = ex.submit(run_step, name, module, streams, name in concurrent)
+                        running[fut] = name
+                        del pending[name]
+                if not running:
+                    raise SystemExit(f"[ERROR] Dependencias imposibles en PIPELINE: {sorted(pending)}")
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    name = running.pop(fut)
+                    fut.result()  # fail-fast: re-lanza el SystemExit del paso
+                    done.add(name)
+    finally:
+        sys.stdout, sys.stderr = streams[0]._real, streams[1]._real
 
     print("\n✅ Weekly update completado correctamente.")
 
+
 if __name__ == "__main__":
     main()
 
 
-## python src\run_weekly_update.py 
+## python src\run_weekly_update.py